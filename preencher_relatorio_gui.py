@@ -9,6 +9,7 @@ Funcionalidades:
 - Gera [OBJETIVO_EMPRESA] opcional via provedor de IA (pluggable)
 - Insere hyperlink para [LINK_DRIVE] e [LINK_PARA_DOWNLOAD]
 - Insere imagem para [IDENTIDADE_VISUAL_E_PALETA_DE_CORES]
+- Preenchimento rápido direto no XML (lxml); --compat usa o caminho python-docx
 - Modo GUI (Tkinter) quando disponível; caso contrário, modo CLI automático
 - Argumentos de linha de comando para rodar em modo não-GUI
 - Testes unitários simples acessíveis via --run-tests
@@ -20,10 +21,25 @@ import time
 import sys
 import json
 import argparse
-import requests
+import copy
+import io
+import bisect
+import itertools
+import multiprocessing
+import threading
+import zipfile
+import contextlib
+import functools
+import hashlib
+import asyncio
+import csv
+import random
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Optional
-from docx.shared import Inches
+from typing import IO, Dict, List, Optional, Tuple, Union
+# requests e python-docx (pesados) só são importados onde são usados: --help e os
+# prompts do CLI aparecem sem esperar por eles
 # tenta importar tkinter dinamicamente (alguns ambientes não têm suporte)
 try:
     import tkinter as tk
@@ -34,43 +50,339 @@ except Exception:
     tk = None
     filedialog = None
     messagebox = None
-# docx (necessário instalar python-docx)
-from docx import Document
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx.opc.constants import RELATIONSHIP_TYPE as RT
+# diskcache é opcional: sem ele as consultas simplesmente não são cacheadas
+try:
+    from diskcache import Cache
+    DISKCACHE_AVAILABLE = True
+except Exception:
+    Cache = None
+    DISKCACHE_AVAILABLE = False
+# requests-cache é opcional: respeita Cache-Control/ETag e responde 304 sem baixar o corpo
+# (só verificado aqui; importado ao criar a sessão)
+REQUESTS_CACHE_AVAILABLE = importlib.util.find_spec("requests_cache") is not None
+# sentence-transformers/numpy são opcionais: habilitam o cache semântico de objetivos
+# (importados só quando o cache semântico é usado: carregar o torch leva segundos)
+SEMANTIC_CACHE_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("numpy", "sentence_transformers"))
+# aiohttp é opcional: sem ele o lote consulta a ReceitaWS pelo pool de threads
+# (importado só no modo lote)
+AIOHTTP_AVAILABLE = importlib.util.find_spec("aiohttp") is not None
+# orjson é opcional: decodifica as respostas JSON bem mais rápido que o json da stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except Exception:
+    orjson = None
+    _json_loads = json.loads
+# lxml vem com o python-docx (necessário instalar python-docx)
+from lxml import etree
 # ----------------- Configuração -----------------
 RECEITAWS_URL = "https://www.receitaws.com.br/v1/cnpj/{}"
 REQUEST_TIMEOUT = 10
+CACHE_DIR = Path(os.environ.get("PREENCHER_RELATORIO_CACHE", Path.home() / ".preencher_relatorio" / "cache"))
+CACHE_TTL = int(os.environ.get("PREENCHER_RELATORIO_CACHE_TTL", 24 * 60 * 60))
+HTTP_CACHE_TTL = 60 * 60
+RETRY_STATUS = (429, 500, 502, 503, 504)
+HTTP_RETRY_TOTAL = 3
+HTTP_BACKOFF_FACTOR = 0.5
+BATCH_WORKERS = 8
+# consultas por minuto à ReceitaWS no modo lote (a API pública aceita 3); 0 = sem limite
+RECEITAWS_RATE = float(os.environ.get("PREENCHER_RELATORIO_RECEITAWS_RATE", 3))
+# uma conexão keep-alive por thread do lote, por host
+HTTP_POOL_SIZE = BATCH_WORKERS
+# deflate nível 1 é bem mais rápido que o padrão (6) e quase do mesmo tamanho para XML
+DOCX_COMPRESSLEVEL = 1
+# mídia já comprimida vai para o zip sem recompressão (ZIP_STORED)
+PRECOMPRESSED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".wdp")
+NO_IMAGE_TEXT = "Nenhuma imagem fornecida para Identidade Visual e Paleta de Cores."
+AI_CACHE_TTL = 30 * 24 * 60 * 60
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = float(os.environ.get("PREENCHER_RELATORIO_SEMANTIC_THRESHOLD", 0.92))
+# embeddings comparados no cache semântico: só os mais recentes
+SEMANTIC_MAX_ENTRIES = 1000
+AI_SUMMARY_KEYS = ("nome", "fantasia", "porte", "situacao", "atividade_principal")
+# campos da ReceitaWS que compõem [ENDERECO] e [RESUMO_EMPRESA_CLIENTE] (depois da atividade), na ordem
+_ADDR_KEYS = ("logradouro", "numero", "bairro", "municipio", "uf", "cep")
+_RESUMO_KEYS = ("porte", "situacao")
+# prompts por POST na Inference API do HF (modo lote)
+HF_BATCH_SIZE = 16
+# POSTs simultâneos ao HF, somando todas as threads
+HF_MAX_CONCURRENCY = 4
+# pausa máxima pedida pela API (Retry-After/x-ratelimit-reset); acima disso a chamada falha
+HF_MAX_PAUSE = 30
+HF_API_URL = "https://api-inference.huggingface.co/models/"
+# no HF o 429 e o Retry-After voltam para _post, que pausa pelo _HF_LIMITER (com teto) em vez de dormir no urllib3
+HF_RETRY_OPTIONS = dict(
+    status_forcelist=tuple(s for s in RETRY_STATUS if s != 429),
+    respect_retry_after_header=False,
+)
 PLACEHOLDER_PATTERN = re.compile(r'\[([A-Z0-9_]+)\]')
+IMAGE_KEY = "IDENTIDADE_VISUAL_E_PALETA_DE_CORES"
+LINK_KEYS = frozenset(("LINK_DRIVE", "LINK_DRIVE_TEXT", "LINK_PARA_DOWNLOAD", "LINK_PARA_DOWNLOAD_TEXT"))
+# chaves com tratamento próprio em replace_in_paragraph (hyperlink/imagem), fora do texto comum
+SPECIAL_KEYS = LINK_KEYS | {IMAGE_KEY}
+IMAGE_PLACEHOLDER = f"[{IMAGE_KEY}]"
 # ----------------- Utilitários -----------------
+# tabela de str.translate que apaga todo caractere latin-1 que não seja dígito ASCII
+_NON_DIGITS = str.maketrans("", "", "".join(chr(c) for c in range(256) if not "0" <= chr(c) <= "9"))
+# idem, mas mantendo "\n": separa os itens do lote em normalize_cnpj_batch
+_NON_DIGITS_KEEP_NL = str.maketrans("", "", "".join(chr(c) for c in range(256) if not ("0" <= chr(c) <= "9" or chr(c) == "\n")))
+_NON_DIGIT_RE = re.compile(r"[^0-9]")
+_CNPJ_DIGITS_ONLY = re.compile(r"[0-9]{14}").fullmatch
+
+def _cnpj_digits(cnpj_raw: str) -> str:
+    if cnpj_raw and _CNPJ_DIGITS_ONLY(cnpj_raw):
+        # já normalizado (arquivo de lote, chave de cache): nada a remover
+        return cnpj_raw
+    digits = (cnpj_raw or '').translate(_NON_DIGITS)
+    if not digits.isascii():
+        # sobrou algum caractere fora do latin-1 (ex.: travessão colado); raro, vai pela regex
+        digits = _NON_DIGIT_RE.sub('', digits)
+    return digits
+
 def normalize_cnpj(cnpj_raw: str) -> str:
-    digits = re.sub(r'\D', '', cnpj_raw or '')
+    digits = _cnpj_digits(cnpj_raw)
     if len(digits) != 14:
         raise ValueError("CNPJ deve conter 14 dígitos (após remover pontuação).")
     return digits
 
-def consulta_empresa(cnpj: str) -> dict:
+def normalize_cnpj_batch(cnpjs_raw: List[str]) -> Tuple[List[str], List[str]]:
+    """Normaliza uma lista de CNPJs; retorna (válidos sem repetição, entradas inválidas)."""
+    valid, invalid = {}, []
+    joined = "\n".join(raw or "" for raw in cnpjs_raw)
+    if joined.count("\n") == len(cnpjs_raw) - 1:
+        # um único translate para o lote todo, depois separa por linha
+        digits_list = joined.translate(_NON_DIGITS_KEEP_NL).split("\n")
+    else:
+        digits_list = [_cnpj_digits(raw) for raw in cnpjs_raw]  # alguma entrada contém "\n"
+    for raw, digits in zip(cnpjs_raw, digits_list):
+        if not digits.isascii():
+            digits = _NON_DIGIT_RE.sub('', digits)
+        if len(digits) == 14:
+            valid[digits] = None
+        else:
+            invalid.append(raw)
+    return list(valid), invalid
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Cache em disco (diskcache) compartilhado; None se indisponível."""
+    global _cache
+    if _cache is None and DISKCACHE_AVAILABLE:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = Cache(str(CACHE_DIR))
+                except Exception as e:
+                    print(f"Aviso: cache em disco desativado: {e}", file=sys.stderr)
+                    return None
+    return _cache
+
+def _make_retry(status_forcelist=RETRY_STATUS, respect_retry_after_header=True):
+    """urllib3 Retry com backoff exponencial e jitter, respeitando Retry-After (429/503)."""
+    from urllib3.util import Retry
+    options = dict(
+        total=HTTP_RETRY_TOTAL,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=status_forcelist,
+        allowed_methods=("GET", "POST"),
+        respect_retry_after_header=respect_retry_after_header,
+    )
+    try:
+        return Retry(backoff_jitter=0.5, **options)
+    except TypeError:
+        # urllib3 < 2.0 não tem backoff_jitter
+        return Retry(**options)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Sessão HTTP compartilhada (CachedSession se houver requests-cache), criada uma vez sob lock."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+def _make_adapter(**retry_options):
+    from requests.adapters import HTTPAdapter
+    # pool de conexões keep-alive + retry/backoff do urllib3 no lugar do loop manual
+    return HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=_make_retry(**retry_options),
+    )
+
+def _create_session():
+    import requests
+    if REQUESTS_CACHE_AVAILABLE:
+        import requests_cache
+        # o corpo do POST entra na chave do cache, então (modelo, prompt) do HF já é uma chave estável
+        session = requests_cache.CachedSession(
+            str(CACHE_DIR / "http"),
+            backend="sqlite",
+            expire_after=HTTP_CACHE_TTL,
+            cache_control=True,
+            allowable_methods=("GET", "POST"),
+        )
+    else:
+        session = requests.Session()
+    adapter = _make_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.mount(HF_API_URL, _make_adapter(**HF_RETRY_OPTIONS))
+    return session
+
+def _read_json_file(path: Path, ttl: int):
+    """Conteúdo de um arquivo do cache sem diskcache; None se ausente, inválido ou mais velho que `ttl` (mtime)."""
+    try:
+        if time.time() - path.stat().st_mtime > ttl:
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def _write_json_file(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def _load_cached_empresa(cnpj: str) -> Optional[dict]:
+    """Payload salvo em disco: diskcache se instalado, senão <CACHE_DIR>/receitaws/<cnpj>.json (TTL pelo mtime)."""
+    cache = get_cache()
+    if cache is not None:
+        return cache.get(f"receitaws:{cnpj}")
+    return _read_json_file(CACHE_DIR / "receitaws" / f"{cnpj}.json", CACHE_TTL)
+
+def _persist_cache(cnpj: str, data: dict) -> None:
+    cache = get_cache()
+    if cache is not None:
+        cache.set(f"receitaws:{cnpj}", data, expire=CACHE_TTL)
+        return
+    try:
+        _write_json_file(CACHE_DIR / "receitaws" / f"{cnpj}.json", data)
+    except OSError as e:
+        print(f"Aviso: não foi possível salvar o cache de {cnpj}: {e}", file=sys.stderr)
+
+def consulta_empresa(cnpj: str, use_cache: bool = True) -> dict:
+    if not use_cache:
+        return _fetch_empresa(cnpj, use_cache=False)
+    return _consulta_empresa_cached(cnpj)
+
+@functools.lru_cache(maxsize=256)
+def _consulta_empresa_cached(cnpj: str) -> dict:
+    # memória (lru_cache) -> disco -> rede; erros não são memoizados
+    data = _load_cached_empresa(cnpj)
+    if data is None:
+        data = _fetch_empresa(cnpj, use_cache=True)
+        _persist_cache(cnpj, data)
+    return data
+
+def _fetch_empresa(cnpj: str, use_cache: bool) -> dict:
+    import requests
     url = RECEITAWS_URL.format(cnpj)
-    tries = 0
-    while tries < 3:
-        tries += 1
+    session = get_session()
+    # bypass só desta requisição: cache_disabled() mexe na sessão compartilhada entre threads
+    bypass = {"force_refresh": True} if not use_cache and hasattr(session, "cache") else {}
+    try:
+        resp = session.get(url, timeout=REQUEST_TIMEOUT, **bypass)
+        resp.raise_for_status()
+        data = _json_loads(resp.content)
+    except (requests.RequestException, ValueError) as e:
+        raise RuntimeError(f"Falha ao consultar ReceitaWS: {e}")
+    return _check_receitaws_payload(data)
+
+def _check_receitaws_payload(data) -> dict:
+    if isinstance(data, dict) and data.get("status") == "ERROR":
+        raise RuntimeError(f"ReceitaWS retornou erro: {data.get('message')}")
+    return data
+
+def _retry_wait(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Espera antes da tentativa `attempt` + 1: Retry-After (em segundos) se veio, senão o backoff da sessão."""
+    if retry_after:
         try:
-            resp = requests.get(url, timeout=REQUEST_TIMEOUT)
-            if resp.status_code != 200:
-                if resp.status_code in (429, 500, 502, 503, 504):
-                    time.sleep(1 + tries)
-                    continue
-                resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, dict) and data.get("status") == "ERROR":
-                raise RuntimeError(f"ReceitaWS retornou erro: {data.get('message')}")
-            return data
-        except requests.RequestException as e:
-            if tries >= 3:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass  # formato data HTTP: usa o backoff
+    return HTTP_BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, 0.5)
+
+class _AsyncRateLimiter:
+    """Espaça o início das requisições a um host: no máximo `per_minute` por minuto (0 = sem limite)."""
+    def __init__(self, per_minute: float):
+        self._interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        # sem await entre ler e reservar o horário: no event loop isso já é atômico
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+async def _fetch_empresa_async(http, cnpj: str, sem: asyncio.Semaphore, limiter: _AsyncRateLimiter) -> dict:
+    import aiohttp
+    # mesma política do HTTPAdapter (_make_retry), mas esperando com asyncio.sleep: as outras consultas seguem
+    url = RECEITAWS_URL.format(cnpj)
+    async with sem:
+        for attempt in range(HTTP_RETRY_TOTAL + 1):
+            last = attempt == HTTP_RETRY_TOTAL
+            # cada tentativa conta na cota da API
+            await limiter.wait()
+            try:
+                async with http.get(url) as resp:
+                    if resp.status not in RETRY_STATUS or last:
+                        resp.raise_for_status()
+                        data = _json_loads(await resp.read())
+                        break
+                    wait = _retry_wait(attempt, resp.headers.get("Retry-After"))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last:
+                    raise RuntimeError(f"Falha ao consultar ReceitaWS: {e}")
+                wait = _retry_wait(attempt)
+            except (aiohttp.ClientError, ValueError) as e:
                 raise RuntimeError(f"Falha ao consultar ReceitaWS: {e}")
-            time.sleep(1 + tries)
-    raise RuntimeError("Não foi possível consultar ReceitaWS após tentativas.")
+            await asyncio.sleep(wait)
+    return _check_receitaws_payload(data)
+
+async def _consulta_empresa_async(http, cnpj: str, sem: asyncio.Semaphore, limiter: _AsyncRateLimiter,
+                                  use_cache: bool) -> dict:
+    data = _load_cached_empresa(cnpj) if use_cache else None
+    if data is None:
+        if http is None:
+            # sem aiohttp: a consulta síncrona roda no pool padrão, limitada pelo mesmo semáforo
+            async with sem:
+                await limiter.wait()
+                return await asyncio.to_thread(consulta_empresa, cnpj, use_cache)
+        data = await _fetch_empresa_async(http, cnpj, sem, limiter)
+        if use_cache:
+            # como consulta_empresa: com use_cache=False o disco não é lido nem gravado
+            _persist_cache(cnpj, data)
+    return data
+
+async def consulta_empresas(cnpjs: List[str], use_cache: bool = True, concurrency: int = BATCH_WORKERS,
+                            rate_per_minute: float = RECEITAWS_RATE) -> Dict[str, Union[dict, Exception]]:
+    """Consulta vários CNPJs concorrentemente; retorna {cnpj: payload ou exceção}."""
+    sem = asyncio.Semaphore(concurrency)
+    # o semáforo limita quantas consultas estão em voo; a cota da ReceitaWS é por minuto
+    limiter = _AsyncRateLimiter(rate_per_minute)
+    if AIOHTTP_AVAILABLE:
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+            results = await asyncio.gather(
+                *(_consulta_empresa_async(http, c, sem, limiter, use_cache) for c in cnpjs), return_exceptions=True)
+    else:
+        results = await asyncio.gather(
+            *(_consulta_empresa_async(None, c, sem, limiter, use_cache) for c in cnpjs), return_exceptions=True)
+    return dict(zip(cnpjs, results))
 
 def build_mapping(data: dict) -> dict:
     def safe_get(key, default=""):
@@ -87,19 +399,8 @@ def build_mapping(data: dict) -> dict:
             atividade_principal = data["atividade_principal"][0].get("text", "")
         except Exception:
             atividade_principal = str(data.get("atividade_principal"))
-    resumo = " | ".join(filter(None, [
-        atividade_principal,
-        safe_get("porte"),
-        safe_get("situacao")
-    ]))
-    endereco = " - ".join(filter(None, [
-        safe_get("logradouro"),
-        safe_get("numero"),
-        safe_get("bairro"),
-        safe_get("municipio"),
-        safe_get("uf"),
-        safe_get("cep"),
-    ]))
+    resumo = " | ".join(v for v in (atividade_principal, *map(safe_get, _RESUMO_KEYS)) if v)
+    endereco = " - ".join(v for v in map(safe_get, _ADDR_KEYS) if v)
     mapping = {
         "NOME_EMPRESA_CLIENTE": safe_get("nome"),
         "FANTASIA": safe_get("fantasia"),
@@ -132,6 +433,20 @@ class AIProviderBase:
     def generate_objective(self, source_text: str, context: dict) -> str:
         raise NotImplementedError
 
+    async def generate_objectives_async(self, items: List[Tuple[str, dict]],
+                                        concurrency: int = BATCH_WORKERS) -> List[Union[str, Exception]]:
+        """Um objetivo por (source_text, context), na ordem; falha de um item vem como a exceção."""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(source_text, context):
+            async with sem:
+                return await asyncio.to_thread(self.generate_objective, source_text, context)
+        return await asyncio.gather(*(one(s, c) for s, c in items), return_exceptions=True)
+
+    def generate_objectives(self, items: List[Tuple[str, dict]],
+                            concurrency: int = BATCH_WORKERS) -> List[Union[str, Exception]]:
+        return asyncio.run(self.generate_objectives_async(items, concurrency))
+
 class MockProvider(AIProviderBase):
     def generate_objective(self, source_text: str, context: dict) -> str:
         nome = context.get("NOME_EMPRESA_CLIENTE", "").strip()
@@ -147,40 +462,130 @@ class MockProvider(AIProviderBase):
                 return f"O objetivo da {nome} é {first_sent}."
         return f"O objetivo da {nome} é oferecer produtos/serviços no seu segmento de atuação."
 
+class _RateLimiter:
+    """Limita chamadas simultâneas a uma API e pausa todas quando a cota acaba."""
+    def __init__(self, max_concurrent: int, max_pause: float):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._max_pause = max_pause
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            wait = self._resume_at - time.time()
+        if wait > self._max_pause:
+            self._slots.release()
+            raise RuntimeError(f"limite de requisições da API: nova tentativa só em {wait:.0f}s")
+        if wait > 0:
+            print(f"Aviso: limite de requisições da API, aguardando {wait:.1f}s", file=sys.stderr)
+            time.sleep(wait)  # roda nas threads do lote (asyncio.to_thread), não no event loop
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.time() + seconds)
+
+    def update(self, headers) -> None:
+        pause = None
+        try:
+            if headers.get("Retry-After"):
+                pause = float(headers["Retry-After"])
+            elif headers.get("x-ratelimit-remaining") is not None and int(headers["x-ratelimit-remaining"]) <= 0:
+                reset = float(headers.get("x-ratelimit-reset") or 1)
+                # o reset vem como epoch (s) ou como segundos até o reset, conforme a API
+                pause = reset - time.time() if reset > 1e9 else reset
+        except ValueError:
+            return
+        if pause and pause > 0:
+            self.pause(pause)
+
+_HF_LIMITER = _RateLimiter(HF_MAX_CONCURRENCY, HF_MAX_PAUSE)
+
 class HuggingFaceProvider(AIProviderBase):
-    def __init__(self, api_token: Optional[str] = None, model: str = "google/flan-t5-large"):
+    def __init__(self, api_token: Optional[str] = None, model: str = "google/flan-t5-large", use_cache: bool = True):
         self.api_token = api_token or os.environ.get("HUGGINGFACE_API_TOKEN")
         self.model = model
+        self.use_cache = use_cache
         if not self.api_token:
             raise RuntimeError("Hugging Face token não configurado (HUGGINGFACE_API_TOKEN).")
 
-    def generate_objective(self, source_text: str, context: dict) -> str:
-        prompt = (
+    @staticmethod
+    def _prompt(source_text: str) -> str:
+        return (
             "Você é um assistente que escreve um 'Objetivo da Empresa' curto (1-2 parágrafos) "
             "baseado nas informações abaixo. Seja direto e formal.\n\n"
             f"INFORMAÇÕES:\n{source_text}\n\n"
             "RETORNE APENAS o texto final, sem rótulos."
         )
-        url = f"https://api-inference.huggingface.co/models/{self.model}"
-        headers = {"Authorization": f"Bearer {self.api_token}"}
-        payload = {"inputs": prompt, "options": {"wait_for_model": True}}
-        resp = requests.post(url, json=payload, headers=headers, timeout=30)
-        if resp.status_code != 200:
-            raise RuntimeError(f"HF API erro {resp.status_code}: {resp.text}")
-        result = resp.json()
-        text = ""
-        if isinstance(result, list) and result:
-            first = result[0]
-            if isinstance(first, dict):
-                text = first.get("generated_text") or first.get("text") or str(first)
-            else:
-                text = str(first)
-        elif isinstance(result, dict):
+
+    @staticmethod
+    def _result_text(result) -> str:
+        if isinstance(result, list):
+            result = result[0] if result else ""
+        if isinstance(result, dict):
             text = result.get("generated_text") or result.get("text") or json.dumps(result)
         else:
             text = str(result)
         return (text or "").strip()
 
+    def _post(self, inputs):
+        url = HF_API_URL + self.model
+        headers = {"Authorization": f"Bearer {self.api_token}"}
+        payload = {"inputs": inputs, "options": {"wait_for_model": True}}
+        session = get_session()
+        bypass = {"force_refresh": True} if not self.use_cache and hasattr(session, "cache") else {}
+        for attempt in range(HTTP_RETRY_TOTAL + 1):
+            # a espera pedida pelo 429 fica no _HF_LIMITER, que falha acima de HF_MAX_PAUSE
+            with _HF_LIMITER:
+                resp = session.post(url, json=payload, headers=headers, timeout=30, **bypass)
+            if not getattr(resp, "from_cache", False):
+                _HF_LIMITER.update(resp.headers)
+            if resp.status_code != 429 or attempt == HTTP_RETRY_TOTAL:
+                break
+            _HF_LIMITER.pause(HTTP_BACKOFF_FACTOR * 2 ** attempt)  # 429 sem Retry-After
+        if resp.status_code != 200:
+            raise RuntimeError(f"HF API erro {resp.status_code}: {resp.text}")
+        return _json_loads(resp.content)
+
+    def generate_objective(self, source_text: str, context: dict) -> str:
+        return self._result_text(self._post(self._prompt(source_text)))
+
+    def generate_objectives_batch(self, source_texts: List[str]) -> List[str]:
+        """Vários prompts em um POST só (text2text aceita "inputs" como lista)."""
+        results = self._post([self._prompt(s) for s in source_texts])
+        if not isinstance(results, list) or len(results) != len(source_texts):
+            raise RuntimeError(f"HF API: resposta em lote inesperada: {str(results)[:200]}")
+        return [self._result_text(r) for r in results]
+
+    async def generate_objectives_async(self, items: List[Tuple[str, dict]],
+                                        concurrency: int = BATCH_WORKERS) -> List[Union[str, Exception]]:
+        sem = asyncio.Semaphore(concurrency)
+        chunks = [items[i:i + HF_BATCH_SIZE] for i in range(0, len(items), HF_BATCH_SIZE)]
+
+        async def one(chunk):
+            async with sem:
+                try:
+                    return await asyncio.to_thread(self.generate_objectives_batch, [s for s, _ in chunk])
+                except Exception as e:
+                    return [e] * len(chunk)
+        results = await asyncio.gather(*(one(c) for c in chunks))
+        return [r for chunk_results in results for r in chunk_results]
+
+@functools.lru_cache(maxsize=4)
+def _openai_client(api_key: str):
+    """Cliente OpenAI reaproveitado entre instâncias (import + init do SDK só uma vez)."""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+def _async_openai_client(api_key: str):
+    # não memoizado: o AsyncOpenAI fica preso ao event loop em que foi usado
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_key)
+
 class OpenAIProvider(AIProviderBase):
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
@@ -188,151 +593,599 @@ class OpenAIProvider(AIProviderBase):
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY não configurada.")
         try:
-            from openai import OpenAI
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = _openai_client(self.api_key)
         except Exception as e:
             raise RuntimeError("Biblioteca openai não instalada. pip install openai") from e
 
-    def generate_objective(self, source_text: str, context: dict) -> str:
+    def _request(self, source_text: str, **kwargs) -> dict:
         prompt = (
             "Escreva um texto curto (1-2 parágrafos) intitulado 'Objetivo da Empresa' baseado nas "
             "informações abaixo. Use linguagem formal e direta. Retorne apenas o texto.\n\n"
             f"INFORMAÇÕES:\n{source_text}\n"
         )
-        resp = self.client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=256,
             temperature=0.2,
+            **kwargs,
         )
-        content = resp.choices[0].message.content.strip()
-        return content
 
-def get_ai_provider(name: Optional[str]) -> AIProviderBase:
+    def generate_objective(self, source_text: str, context: dict) -> str:
+        stream = self.client.chat.completions.create(**self._request(source_text, stream=True))
+        parts = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        return "".join(parts).strip()
+
+    async def generate_objectives_async(self, items: List[Tuple[str, dict]],
+                                        concurrency: int = BATCH_WORKERS) -> List[Union[str, Exception]]:
+        """Todas as chamadas em voo no mesmo event loop (AsyncOpenAI), no máximo `concurrency` por vez."""
+        sem = asyncio.Semaphore(concurrency)
+        async with _async_openai_client(self.api_key) as client:
+            async def one(source_text):
+                async with sem:
+                    resp = await client.chat.completions.create(**self._request(source_text))
+                return (resp.choices[0].message.content or "").strip()
+            return await asyncio.gather(*(one(s) for s, _ in items), return_exceptions=True)
+
+_embedder = None
+
+def _get_embedder():
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer(SEMANTIC_MODEL)
+    return _embedder
+
+class CachedAIProvider(AIProviderBase):
+    """Envolve um provedor real e reaproveita objetivos já gerados (cache exato e, opcionalmente, semântico)."""
+    def __init__(self, provider: AIProviderBase, semantic: bool = False):
+        self.provider = provider
+        self.model = getattr(provider, "model", "")
+        self.semantic = semantic and SEMANTIC_CACHE_AVAILABLE
+        self._prefix = f"ai:{type(provider).__name__}:{self.model}"
+        self._memory: Dict[str, str] = {}
+
+    @staticmethod
+    def normalize(source_text: str) -> str:
+        return " ".join((source_text or "").split()).lower()
+
+    def _key(self, source_text: str) -> str:
+        payload = f"{self._prefix}\0{self.normalize(source_text)}"
+        return f"{self._prefix}:{hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()}"
+
+    @staticmethod
+    def _objective_path(key: str) -> Path:
+        return CACHE_DIR / "ai" / f"{key.rsplit(':', 1)[1]}.json"
+
+    def _get(self, key: str):
+        cache = get_cache()
+        if cache is not None:
+            return cache.get(key)
+        if key in self._memory or key.endswith(":semantic"):
+            return self._memory.get(key)
+        return _read_json_file(self._objective_path(key), AI_CACHE_TTL)
+
+    def _set(self, key: str, value) -> None:
+        cache = get_cache()
+        if cache is not None:
+            cache.set(key, value, expire=AI_CACHE_TTL)
+            return
+        self._memory[key] = value
+        # os embeddings (numpy) ficam só em memória; o texto do objetivo é persistido
+        if isinstance(value, str):
+            try:
+                _write_json_file(self._objective_path(key), value)
+            except OSError as e:
+                print(f"Aviso: não foi possível salvar o cache da IA: {e}", file=sys.stderr)
+
+    def _semantic_lookup(self, embedding) -> Optional[str]:
+        entries = self._get(f"{self._prefix}:semantic") or []
+        if not entries:
+            return None
+        import numpy as np
+        matrix = np.stack([e for e, _ in entries])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= SEMANTIC_THRESHOLD:
+            return entries[best][1]
+        return None
+
+    def _lookup(self, source_text: str):
+        """(chave, embedding, objetivo em cache ou None)."""
+        key = self._key(source_text)
+        # o cache é só um atalho: se falhar, o provedor é chamado normalmente
+        try:
+            cached = self._get(key)
+        except Exception as e:
+            print(f"Aviso: cache da IA indisponível: {e}", file=sys.stderr)
+            return key, None, None
+        if cached is not None:
+            return key, None, cached
+        embedding = None
+        if self.semantic:
+            try:
+                embedding = _get_embedder().encode(self.normalize(source_text), normalize_embeddings=True)
+                similar = self._semantic_lookup(embedding)
+            except Exception as e:
+                print(f"Aviso: cache semântico da IA desativado: {e}", file=sys.stderr)
+                self.semantic = False
+                return key, None, None
+            if similar is not None:
+                return key, embedding, similar
+        return key, embedding, None
+
+    def _store(self, key: str, embedding, objective: str) -> None:
+        if not objective:
+            return
+        try:
+            self._set(key, objective)
+            if embedding is not None:
+                entries = self._get(f"{self._prefix}:semantic") or []
+                entries.append((embedding, objective))
+                self._set(f"{self._prefix}:semantic", entries[-SEMANTIC_MAX_ENTRIES:])
+        except Exception as e:
+            print(f"Aviso: não foi possível salvar o cache da IA: {e}", file=sys.stderr)
+
+    def generate_objective(self, source_text: str, context: dict) -> str:
+        key, embedding, cached = self._lookup(source_text)
+        if cached is not None:
+            return cached
+        objective = self.provider.generate_objective(source_text, context)
+        self._store(key, embedding, objective)
+        return objective
+
+    async def generate_objectives_async(self, items: List[Tuple[str, dict]],
+                                        concurrency: int = BATCH_WORKERS) -> List[Union[str, Exception]]:
+        # só os misses vão para o provedor, em um lote só e uma vez por chave
+        keys = [self._key(s) for s, _ in items]
+        first: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+        lookups = {key: self._lookup(items[i][0]) for key, i in first.items()}
+        found: Dict[str, Union[str, Exception, None]] = {key: cached for key, (_, _, cached) in lookups.items()}
+        misses = [key for key, cached in found.items() if cached is None]
+        if misses:
+            generated = await self.provider.generate_objectives_async([items[first[k]] for k in misses], concurrency)
+            for key, objective in zip(misses, generated):
+                if not isinstance(objective, Exception):
+                    self._store(key, lookups[key][1], objective)
+                found[key] = objective
+        return [found[key] for key in keys]
+
+def get_ai_provider(name: Optional[str], use_cache: bool = True) -> AIProviderBase:
     name = (name or "mock").lower()
     if name == "mock":
         return MockProvider()
     if name in ("hf", "huggingface"):
-        return HuggingFaceProvider()
-    if name in ("openai", "gpt"):
-        return OpenAIProvider()
-    raise ValueError(f"Provider IA desconhecido: {name}")
+        provider = HuggingFaceProvider(use_cache=use_cache)
+    elif name in ("openai", "gpt"):
+        provider = OpenAIProvider()
+    else:
+        raise ValueError(f"Provider IA desconhecido: {name}")
+    if not use_cache:
+        return provider
+    semantic = os.environ.get("AI_SEMANTIC_CACHE", "").lower() in ("1", "true", "s", "sim")
+    return CachedAIProvider(provider, semantic=semantic)
+
+def ai_source_text(data: dict, mapping: dict) -> str:
+    """Texto-base enviado ao provedor de IA para gerar [OBJETIVO_EMPRESA]."""
+    source_parts = []
+    if mapping.get("ATIVIDADE_PRINCIPAL"):
+        source_parts.append("Atividade principal: " + mapping["ATIVIDADE_PRINCIPAL"])
+    if mapping.get("RESUMO_EMPRESA_CLIENTE"):
+        source_parts.append("Resumo: " + mapping["RESUMO_EMPRESA_CLIENTE"])
+    source_text = "\n".join(source_parts).strip()
+    if source_text:
+        return source_text
+    # fallback compacto: só os campos relevantes, em JSON sem espaços (menos tokens que o repr do dict)
+    summary = {k: data.get(k) for k in AI_SUMMARY_KEYS if data.get(k)}
+    return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))[:1500]
 
 # ----------------- DOCX helpers -----------------
-def add_hyperlink(paragraph, url: str, text: str):
-    part = paragraph.part
-    r_id = part.relate_to(url, RT.HYPERLINK, is_external=True)
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W = f"{{{W_NS}}}"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# mesmo valor de docx.opc.constants.RELATIONSHIP_TYPE.HYPERLINK
+RT_HYPERLINK = f"{R_NS}/hyperlink"
+# tags/caminhos com namespace montados uma vez, não a cada parágrafo
+_W_P = _W + "p"
+_W_R = _W + "r"
+_W_T = _W + "t"
+_W_RUN_TEXT = f"{_W_R}/{_W_T}"
+_W_VAL = _W + "val"
+_R_ID = f"{{{R_NS}}}id"
+_BREAK_SPLIT = re.compile(r"(\n|\r|\t)")
+# filhos de w:r que run.text do python-docx lê como texto, além de w:t
+_RUN_BREAK_TEXT = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n"}
+
+# (placeholder, chave da URL, chave do texto exibido, texto padrão)
+LINK_PLACEHOLDERS = (
+    ("[LINK_DRIVE]", "LINK_DRIVE", "LINK_DRIVE_TEXT", "Link Drive"),
+    ("[LINK_PARA_DOWNLOAD]", "LINK_PARA_DOWNLOAD", "LINK_PARA_DOWNLOAD_TEXT", "Link para download"),
+)
+_LINK_SPLIT = {token: re.compile(f"({re.escape(token)})") for token, *_ in LINK_PLACEHOLDERS}
+
+def _set_t_text(t, text: str):
+    """Define o texto de um w:t; quebras/tabs viram w:br/w:tab como em run.text do python-docx."""
+    t.set(_XML_SPACE, "preserve")
+    if not _BREAK_SPLIT.search(text):
+        t.text = text
+        return
+    from docx.oxml import OxmlElement
+    pieces = _BREAK_SPLIT.split(text)
+    t.text = pieces[0]
+    anchor = t
+    for piece in pieces[1:]:
+        if not piece:
+            continue
+        if piece == "\t":
+            node = OxmlElement("w:tab")
+        elif piece in ("\n", "\r"):
+            node = OxmlElement("w:br")
+        else:
+            node = OxmlElement("w:t")
+            node.set(_XML_SPACE, "preserve")
+            node.text = piece
+        anchor.addnext(node)
+        anchor = node
+
+def _run_text(r) -> str:
+    """Texto de um w:r como em run.text do python-docx (w:tab e w:br/w:cr incluídos)."""
+    return "".join((c.text or "") if c.tag == _W_T else _RUN_BREAK_TEXT.get(c.tag, "") for c in r)
+
+def _run_element(text: str):
+    from docx.oxml import OxmlElement
+    r = OxmlElement("w:r")
+    t = OxmlElement("w:t")
+    r.append(t)
+    _set_t_text(t, text)
+    return r
+
+@functools.lru_cache(maxsize=None)
+def _hyperlink_template():
+    """<w:hyperlink><w:r><w:rPr>(azul, sublinhado)</w:rPr><w:t/></w:r></w:hyperlink>, montado uma vez."""
+    from docx.oxml import OxmlElement
     hyperlink = OxmlElement("w:hyperlink")
-    hyperlink.set(qn("r:id"), r_id)
     new_run = OxmlElement("w:r")
     rPr = OxmlElement("w:rPr")
     c = OxmlElement("w:color")
-    c.set(qn("w:val"), "0000FF")
+    c.set(_W_VAL, "0000FF")
     rPr.append(c)
     u = OxmlElement("w:u")
-    u.set(qn("w:val"), "single")
+    u.set(_W_VAL, "single")
     rPr.append(u)
     new_run.append(rPr)
-    new_t = OxmlElement("w:t")
-    new_t.text = text
-    new_run.append(new_t)
+    new_run.append(OxmlElement("w:t"))
     hyperlink.append(new_run)
+    return hyperlink
+
+def hyperlink_element(r_id: str, text: str):
+    # cópia do template (deepcopy no C do lxml, mantém as classes do python-docx) em vez de 7 OxmlElement
+    hyperlink = copy.deepcopy(_hyperlink_template())
+    hyperlink.set(_R_ID, r_id)
+    hyperlink[0][-1].text = text
+    return hyperlink
+
+def link_paragraph_children(full_text: str, token: str, mapping: CompiledMapping, r_id: str, display: str) -> list:
+    """Runs e w:hyperlink que substituem o texto de um parágrafo com `token`, em ordem."""
+    children = []
+    for piece in _LINK_SPLIT[token].split(full_text):
+        if piece == token:
+            children.append(hyperlink_element(r_id, display))
+        else:
+            piece = mapping.sub(piece)
+            if piece:
+                children.append(_run_element(piece))
+    return children
+
+def add_hyperlink(paragraph, url: str, text: str):
+    part = paragraph.part
+    r_id = part.relate_to(url, RT_HYPERLINK, is_external=True)
+    hyperlink = hyperlink_element(r_id, text)
     paragraph._p.append(hyperlink)
     return hyperlink
 
+class CompiledMapping(dict):
+    """Mapping pronto para substituição em uma única passada de regex."""
+    def __init__(self, mapping: Dict[str, str]):
+        super().__init__(mapping)
+        self.text_values = {k: v or "" for k, v in self.items() if k not in SPECIAL_KEYS}
+        self.pattern = PLACEHOLDER_PATTERN if self.text_values else None
+
+    def _lookup(self, match) -> str:
+        return self.text_values.get(match.group(1), match.group(0))
+
+    def sub(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._lookup, text)
+
+def replace_across_runs(texts: List[str], mapping: CompiledMapping, full_text: Optional[str] = None) -> Optional[List[str]]:
+    """Substitui os placeholders de `texts` (um item por run) preservando a formatação; None se não houver."""
+    if mapping.pattern is None:
+        return None
+    text_values = mapping.text_values
+    if full_text is None:
+        full_text = "".join(texts)
+    matches = [m for m in mapping.pattern.finditer(full_text) if m.group(1) in text_values]
+    if not matches:
+        return None
+    ends = list(itertools.accumulate(len(t) for t in texts))
+    new_texts = list(texts)
+    # de trás para frente, os índices locais dos matches anteriores continuam válidos
+    for match in reversed(matches):
+        first = bisect.bisect_right(ends, match.start())
+        last = bisect.bisect_left(ends, match.end())
+        start = match.start() - (ends[first] - len(texts[first]))
+        stop = match.end() - (ends[last] - len(texts[last]))
+        replacement = mapping._lookup(match)
+        if first == last:
+            new_texts[first] = new_texts[first][:start] + replacement + new_texts[first][stop:]
+        else:
+            new_texts[first] = new_texts[first][:start] + replacement
+            for i in range(first + 1, last):
+                new_texts[i] = ""
+            new_texts[last] = new_texts[last][stop:]
+    return new_texts
+
+def compile_mapping(mapping: Dict[str, str], used: Optional[set] = None) -> CompiledMapping:
+    """CompiledMapping de `mapping`; com `used`, só as chaves usadas pelo template (+ SPECIAL_KEYS)."""
+    if used is not None:
+        mapping = {k: v for k, v in mapping.items() if k in used or k in SPECIAL_KEYS}
+    elif isinstance(mapping, CompiledMapping):
+        return mapping
+    return CompiledMapping(mapping)
+
 def replace_in_paragraph(paragraph, mapping: Dict[str, str]):
-    full_text = "".join([r.text for r in paragraph.runs])
-    non_link_keys = {k: v for k, v in mapping.items() if k not in ("LINK_DRIVE", "LINK_DRIVE_TEXT", "LINK_PARA_DOWNLOAD", "LINK_PARA_DOWNLOAD_TEXT", "IDENTIDADE_VISUAL_E_PALETA_DE_CORES")}
-
-    # Handle [LINK_DRIVE]
-    if "[LINK_DRIVE]" in full_text and mapping.get("LINK_DRIVE"):
-        parts = full_text.split("[LINK_DRIVE]")
-        # Clear all runs
-        for i in range(len(paragraph.runs) - 1, -1, -1):
-            paragraph._element.remove(paragraph.runs[i]._element)
-        for idx, part in enumerate(parts):
-            # Replace other placeholders in this part
-            for key, val in non_link_keys.items():
-                part = part.replace(f'[{key}]', val or "")
-            if part:
-                paragraph.add_run(part)
-            if idx < len(parts) - 1:
-                display = mapping.get("LINK_DRIVE_TEXT") or "Link Drive"
-                add_hyperlink(paragraph, mapping["LINK_DRIVE"], display)
+    mapping = compile_mapping(mapping)
+    # runs e textos lidos uma vez só (run.text percorre os filhos do w:r a cada acesso)
+    runs = paragraph.runs
+    texts = [r.text for r in runs]
+    full_text = "".join(texts)
+    if "[" not in full_text:
         return
 
-    # Handle [LINK_PARA_DOWNLOAD]
-    if "[LINK_PARA_DOWNLOAD]" in full_text and mapping.get("LINK_PARA_DOWNLOAD"):
-        parts = full_text.split("[LINK_PARA_DOWNLOAD]")
-        # Clear all runs
-        for i in range(len(paragraph.runs) - 1, -1, -1):
-            paragraph._element.remove(paragraph.runs[i]._element)
-        for idx, part in enumerate(parts):
-            # Replace other placeholders in this part
-            for key, val in non_link_keys.items():
-                part = part.replace(f'[{key}]', val or "")
-            if part:
-                paragraph.add_run(part)
-            if idx < len(parts) - 1:
-                display = "Link para download"
-                add_hyperlink(paragraph, mapping["LINK_PARA_DOWNLOAD"], display)
-        return
+    # Handle [LINK_DRIVE] / [LINK_PARA_DOWNLOAD]: runs are swapped for text + hyperlink in one extend
+    for token, url_key, text_key, default_text in LINK_PLACEHOLDERS:
+        if token in full_text and mapping.get(url_key):
+            r_id = paragraph.part.relate_to(mapping[url_key], RT_HYPERLINK, is_external=True)
+            p = paragraph._p
+            for r in p.r_lst:
+                p.remove(r)
+            p.extend(link_paragraph_children(full_text, token, mapping, r_id, mapping.get(text_key) or default_text))
+            return
 
     # Handle [IDENTIDADE_VISUAL_E_PALETA_DE_CORES]
-    if "[IDENTIDADE_VISUAL_E_PALETA_DE_CORES]" in full_text:
-        image_path = mapping.get("IDENTIDADE_VISUAL_E_PALETA_DE_CORES")
-        # Clear all runs
-        for i in range(len(paragraph.runs) - 1, -1, -1):
-            paragraph._element.remove(paragraph.runs[i]._element)
+    if IMAGE_PLACEHOLDER in full_text:
+        image_path = mapping.get(IMAGE_KEY)
+        # Clear all runs (r_lst é lido uma vez; paragraph.runs reconstruiria a lista a cada remoção)
+        p = paragraph._p
+        for r in p.r_lst:
+            p.remove(r)
         if image_path and Path(image_path).exists():
             run = paragraph.add_run()
+            from docx.shared import Inches
             run.add_picture(image_path, width=Inches(5.0))
         else:
-            paragraph.add_run("Nenhuma imagem fornecida para Identidade Visual e Paleta de Cores.")
+            paragraph.add_run(NO_IMAGE_TEXT)
         return
 
-    # Normal case: per-run replacement to preserve formatting
-    for run in paragraph.runs:
-        text = run.text
-        for key, val in non_link_keys.items():
-            text = text.replace(f'[{key}]', val or "")
-        run.text = text
-
-    # Check for remaining placeholders (spanning runs)
-    new_full_text = "".join([r.text for r in paragraph.runs])
-    remaining = PLACEHOLDER_PATTERN.findall(new_full_text)
-    if remaining:
-        # Fallback: rebuild with single run (loses formatting for spanning parts)
-        new_text = new_full_text
-        for key, val in non_link_keys.items():
-            new_text = new_text.replace(f'[{key}]', val or "")
-        # Clear runs
-        for i in range(len(paragraph.runs) - 1, -1, -1):
-            paragraph._element.remove(paragraph.runs[i]._element)
-        # Add new run
-        paragraph.add_run(new_text)
-        print(f"Warning: Rebuilt paragraph due to spanning placeholders: {remaining}", file=sys.stderr)
+    # Normal case: only the runs touched by a placeholder change, formatting is preserved
+    new_texts = replace_across_runs(texts, mapping, full_text)
+    if new_texts is None:
+        return
+    for run, old_text, new_text in zip(runs, texts, new_texts):
+        if new_text != old_text:
+            run.text = new_text
+
+def _iter_paragraphs(root) -> list:
+    """Todos os w:p sob `root` (tabelas, células aninhadas e caixas de texto) em uma passada do lxml."""
+    # lista fechada antes de mutar: os ramos de link/imagem trocam os filhos dos parágrafos
+    return list(root.iter(_W_P))
+
+def _has_placeholder_start(p) -> bool:
+    return any("[" in (t.text or "") for t in p.iterfind(_W_RUN_TEXT))
 
 def replace_in_table(table, mapping: Dict[str, str]):
-    for row in table.rows:
-        for cell in row.cells:
-            replace_in_block(cell, mapping)
+    replace_in_block(table, mapping)
 
 def replace_in_block(block, mapping: Dict[str, str]):
-    for para in block.paragraphs:
-        replace_in_paragraph(para, mapping)
-    for table in getattr(block, "tables", []):
-        replace_in_table(table, mapping)
+    from docx.text.paragraph import Paragraph
+    mapping = compile_mapping(mapping)
+    for p in _iter_paragraphs(block._element):
+        # o wrapper Paragraph só é criado para parágrafos com algum '['
+        if _has_placeholder_start(p):
+            replace_in_paragraph(Paragraph(p, block), mapping)
+
+def _zip_write(zipf, name: str, blob: bytes):
+    if name.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+        zipf.writestr(name, blob, compress_type=zipfile.ZIP_STORED)
+    else:
+        zipf.writestr(name, blob)
+
+@contextlib.contextmanager
+def _atomic_docx_zip(output_path: str):
+    """ZipFile de saída montado em memória, gravado em <saida>.tmp de uma vez e trocado atomicamente via os.replace."""
+    tmp_path = f"{output_path}.tmp"
+    buf = io.BytesIO()
+    try:
+        # o zipfile faz milhares de write() pequenos (cabeçalhos, blocos do deflate): no BytesIO, sem syscalls
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=DOCX_COMPRESSLEVEL) as zipf:
+            yield zipf
+        with open(tmp_path, "wb") as f:
+            f.write(buf.getbuffer())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+class _DocxZipWriter:
+    """PhysPkgWriter do python-docx com deflate em DOCX_COMPRESSLEVEL e mídia sem recompressão."""
+    def __init__(self, zipf):
+        self._zipf = zipf
+
+    def write(self, pack_uri, blob):
+        _zip_write(self._zipf, pack_uri.membername, blob)
+
+def save_document(doc, output_path: str):
+    """Equivalente a doc.save(), mas com a compressão de _zip_write e gravação atômica."""
+    from docx.opc.pkgwriter import PackageWriter
+    package = doc.part.package
+    parts = package.parts
+    for part in parts:
+        part.before_marshal()
+    with _atomic_docx_zip(output_path) as zipf:
+        writer = _DocxZipWriter(zipf)
+        PackageWriter._write_content_types_stream(writer, parts)
+        PackageWriter._write_pkg_rels(writer, package.rels)
+        PackageWriter._write_parts(writer, parts)
 
-def process_document(template_path: str, output_path: str, mapping: Dict[str, str]):
+def used_placeholders(blocks) -> set:
+    """Chaves [KEY] que aparecem no texto dos blocos (corpo, cabeçalhos, rodapés)."""
+    used = set()
+    for block in blocks:
+        used.update(PLACEHOLDER_PATTERN.findall("".join(block._element.itertext())))
+    return used
+
+def process_document(template_path: Union[str, IO[bytes]], output_path: str, mapping: Dict[str, str]):
+    from docx import Document
     doc = Document(template_path)
-    replace_in_block(doc, mapping)
+    blocks = [doc]
     for section in doc.sections:
         if section.header:
-            replace_in_block(section.header, mapping)
+            blocks.append(section.header)
         if section.footer:
-            replace_in_block(section.footer, mapping)
-    doc.save(output_path)
+            blocks.append(section.footer)
+    # só as chaves usadas pelo template entram na regex; as especiais são lidas pelos ramos de link/imagem
+    used = used_placeholders(blocks)
+    mapping = compile_mapping(mapping, used)
+    for block in blocks:
+        replace_in_block(block, mapping)
+    save_document(doc, output_path)
+
+# ----------------- DOCX fast path (lxml) -----------------
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_PARSER = etree.XMLParser(resolve_entities=False)
+DOCX_TEXT_PART = re.compile(r"word/(document|header\d*|footer\d*)\.xml")
+
+class _PartRels:
+    """Relacionamentos de uma parte (word/_rels/<parte>.rels), usados para criar hyperlinks."""
+    def __init__(self, name: str, blob: Optional[bytes]):
+        self.name = name
+        if blob:
+            self.root = etree.fromstring(blob, _XML_PARSER)
+        else:
+            self.root = etree.Element(f"{{{PKG_REL_NS}}}Relationships", nsmap={None: PKG_REL_NS})
+        self.changed = False
+        self._by_url: Dict[str, str] = {}
+
+    def hyperlink_id(self, url: str) -> str:
+        r_id = self._by_url.get(url)
+        if r_id:
+            return r_id
+        ids = {rel.get("Id") for rel in self.root}
+        n = len(ids) + 1
+        while f"rId{n}" in ids:
+            n += 1
+        r_id = f"rId{n}"
+        etree.SubElement(self.root, f"{{{PKG_REL_NS}}}Relationship",
+                         Id=r_id, Type=RT_HYPERLINK, Target=url, TargetMode="External")
+        self._by_url[url] = r_id
+        self.changed = True
+        return r_id
+
+def _fast_replace_in_p(p, mapping: CompiledMapping, rels: _PartRels):
+    """Mesmas regras de replace_in_paragraph, direto sobre o elemento w:p."""
+    runs = p.findall(_W_R)
+    t_nodes = [t for r in runs for t in r.iterchildren(_W_T)]
+    texts = [t.text or "" for t in t_nodes]
+    full_text = "".join(texts)
+    if "[" not in full_text:
+        return
+    for token, url_key, text_key, default_text in LINK_PLACEHOLDERS:
+        if token in full_text and mapping.get(url_key):
+            # o parágrafo é refeito: tabs e quebras dos runs entram no texto e voltam como w:tab/w:br
+            run_text = "".join(map(_run_text, runs))
+            for r in runs:
+                p.remove(r)
+            r_id = rels.hyperlink_id(mapping[url_key])
+            p.extend(link_paragraph_children(run_text, token, mapping, r_id, mapping.get(text_key) or default_text))
+            return
+    if IMAGE_PLACEHOLDER in full_text:
+        # com imagem o documento inteiro vai pelo python-docx (ver fast_process_document)
+        for r in runs:
+            p.remove(r)
+        p.append(_run_element(NO_IMAGE_TEXT))
+        return
+    new_texts = replace_across_runs(texts, mapping, full_text)
+    if new_texts is None:
+        return
+    for t, old_text, new_text in zip(t_nodes, texts, new_texts):
+        if new_text != old_text:
+            _set_t_text(t, new_text)
+
+def _rels_name(part_name: str) -> str:
+    folder, _, base = part_name.rpartition("/")
+    return f"{folder}/_rels/{base}.rels"
+
+class TemplateCache:
+    """Template .docx lido e parseado uma única vez, reaproveitado por vários render()."""
+    def __init__(self, template_path: Union[str, IO[bytes]]):
+        self.data = template_path.read() if hasattr(template_path, "read") else Path(template_path).read_bytes()
+        with zipfile.ZipFile(io.BytesIO(self.data)) as zin:
+            self.entries = [(info.filename, zin.read(info)) for info in zin.infolist()]
+        self._blobs = dict(self.entries)
+        self._roots = {}
+        # índices (na ordem de root.iter) dos w:p com algum "[": a forma do template é fixa,
+        # então render() visita só esses parágrafos na cópia em vez de testar todos
+        self._hot: Dict[str, List[int]] = {}
+        self.used = set()
+        for name, blob in self.entries:
+            # sem b"[" nos bytes crus não há placeholder: nem chega a ser parseada
+            if not DOCX_TEXT_PART.fullmatch(name) or b"[" not in blob:
+                continue
+            root = etree.fromstring(blob, _XML_PARSER)
+            part_used = PLACEHOLDER_PATTERN.findall("".join(root.itertext()))
+            # parte sem nenhum [KEY] (cabeçalho/rodapé estático) é copiada como está em render()
+            if part_used:
+                self._roots[name] = root
+                self._hot[name] = [i for i, p in enumerate(root.iter(_W_P)) if _has_placeholder_start(p)]
+                self.used.update(part_used)
+
+    def render(self, output_path: str, mapping: Dict[str, str]):
+        image_path = mapping.get(IMAGE_KEY)
+        if IMAGE_KEY in self.used and image_path and Path(image_path).exists():
+            return process_document(io.BytesIO(self.data), output_path, mapping)
+        mapping = compile_mapping(mapping, self.used)
+        rewritten = {}
+        for name in self._roots:
+            rewritten.update(self._render_part(name, mapping))
+        with _atomic_docx_zip(output_path) as zout:
+            for name, blob in self.entries:
+                _zip_write(zout, name, rewritten.pop(name, blob))
+            for name, blob in rewritten.items():
+                _zip_write(zout, name, blob)
+
+    def _render_part(self, name: str, mapping: CompiledMapping) -> Dict[str, bytes]:
+        """XML preenchido de uma parte (+ o .rels dela, se ganhou hyperlink)."""
+        root = copy.deepcopy(self._roots[name])
+        part_rels = _PartRels(_rels_name(name), self._blobs.get(_rels_name(name)))
+        paragraphs = _iter_paragraphs(root)
+        for i in self._hot[name]:
+            _fast_replace_in_p(paragraphs[i], mapping, part_rels)
+        blobs = {name: etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)}
+        if part_rels.changed:
+            blobs[part_rels.name] = etree.tostring(part_rels.root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        return blobs
+
+def fast_process_document(template_path: Union[str, IO[bytes]], output_path: str, mapping: Dict[str, str]):
+    """Preenche o template editando o XML das partes com lxml, sem o modelo de objetos do python-docx."""
+    TemplateCache(template_path).render(output_path, mapping)
 
 def fix_docx_templates():
     """Fix para PyInstaller não incluir templates docx"""
@@ -346,9 +1199,18 @@ def fix_docx_templates():
             docx.shared.TEMPLATE_DIR = template_dir
 
 # ----------------- CLI flow -----------------
+def _in_background(fn, *args):
+    """Future de fn(*args) rodando numa thread própria, para sobrepor I/O ao resto do fluxo."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(fn, *args)
+    finally:
+        executor.shutdown(wait=False)
+
 def run_cli(template: Optional[str] = None, cnpj: Optional[str] = None, drive: Optional[str] = None,
             drive_text: Optional[str] = None, use_ai: Optional[bool] = None, ai_provider: Optional[str] = None,
-            out: Optional[str] = None, extra_mapping: Optional[dict] = None) -> None:
+            out: Optional[str] = None, extra_mapping: Optional[dict] = None,
+            use_cache: bool = True, compat: bool = False) -> None:
     try:
         if not template:
             template = input("Caminho do template .docx: ").strip()
@@ -363,14 +1225,24 @@ def run_cli(template: Optional[str] = None, cnpj: Optional[str] = None, drive: O
             print("CNPJ inválido:", e)
             return
         print("Consultando ReceitaWS...")
-        data = consulta_empresa(cnpj_norm)
-        mapping = build_mapping(data)
+        # consulta (rede) e leitura do template correm enquanto as perguntas abaixo são respondidas;
+        # `mapping` guarda só as respostas até o payload chegar
+        f_data = _in_background(consulta_empresa, cnpj_norm, use_cache)
+        f_template = None if compat else _in_background(TemplateCache, template)
+
+        def check_lookup():
+            # consulta que já falhou (CNPJ inexistente, status ERROR) encerra antes da próxima pergunta
+            if f_data.done():
+                f_data.result()
+
+        mapping = {}
         if drive is None:
             drive = input("Link do Drive (opcional, ENTER para pular): ").strip()
         if drive:
             if not drive.startswith(("http://", "https://")):
                 drive = "https://" + drive
             mapping["LINK_DRIVE"] = drive
+            check_lookup()
             mapping["LINK_DRIVE_TEXT"] = drive_text or input("Texto do link (ENTER para 'Link Drive'): ").strip() or "Link Drive"
             mapping["LINK_PARA_DOWNLOAD"] = drive
             mapping["LINK_PARA_DOWNLOAD_TEXT"] = "Link para download"
@@ -387,6 +1259,7 @@ def run_cli(template: Optional[str] = None, cnpj: Optional[str] = None, drive: O
         for field, prompt in extra_fields.items():
             value = extra_mapping.get(field, "") if extra_mapping else ""
             if not value:
+                check_lookup()
                 value = input(prompt).strip()
             mapping[field] = value
 
@@ -399,22 +1272,25 @@ def run_cli(template: Optional[str] = None, cnpj: Optional[str] = None, drive: O
         # ESPECIALISTARESPONSAVEL is always fixed
         mapping["ESPECIALISTARESPONSAVEL"] = "ITALO GOMES"
 
+        check_lookup()
         if use_ai is None:
             use_ai = input("Deseja usar IA para preencher [OBJETIVO_EMPRESA]? (s/N): ").strip().lower() == 's'
+        ai = None
         if use_ai:
             provider = (ai_provider or os.environ.get("AI_PROVIDER") or input("Provedor IA (mock/hf/openai) [mock]: ").strip() or "mock")
             try:
-                ai = get_ai_provider(provider)
+                ai = get_ai_provider(provider, use_cache=use_cache)
             except Exception as e:
                 print("Erro ao inicializar provedor IA:", e)
                 print("Usando MockProvider como fallback.")
                 ai = MockProvider()
-            source_parts = []
-            if mapping.get("ATIVIDADE_PRINCIPAL"):
-                source_parts.append("Atividade principal: " + mapping["ATIVIDADE_PRINCIPAL"])
-            if mapping.get("RESUMO_EMPRESA_CLIENTE"):
-                source_parts.append("Resumo: " + mapping["RESUMO_EMPRESA_CLIENTE"])
-            source_text = "\n".join(source_parts).strip() or str(data)[:2000]
+        check_lookup()
+        out_path = out or input("Arquivo de saída (.docx) [relatorio_saida.docx]: ").strip() or f'relatorio_{cnpj_norm}.docx'
+
+        data = f_data.result()
+        mapping = {**build_mapping(data), **mapping}
+        if ai is not None:
+            source_text = ai_source_text(data, mapping)
             try:
                 mapping["OBJETIVO_EMPRESA"] = ai.generate_objective(source_text, mapping)
             except Exception as e:
@@ -423,13 +1299,120 @@ def run_cli(template: Optional[str] = None, cnpj: Optional[str] = None, drive: O
                 mapping["OBJETIVO_EMPRESA"] = MockProvider().generate_objective(source_text, mapping)
         else:
             mapping["OBJETIVO_EMPRESA"] = ""
-        out_path = out or input("Arquivo de saída (.docx) [relatorio_saida.docx]: ").strip() or f'relatorio_{cnpj_norm}.docx'
         print("Gerando documento...")
-        process_document(template, out_path, mapping)
+        if f_template is None:
+            process_document(template, out_path, mapping)
+        else:
+            f_template.result().render(out_path, mapping)
         print("Documento gerado:", out_path)
     except Exception as e:
         print("Erro durante execução:", e)
 
+# ----------------- Batch flow -----------------
+def read_cnpjs_file(path: str) -> list:
+    """CNPJs de um arquivo: um por linha ou CSV (primeira coluna); linhas sem dígito (cabeçalho, #) são ignoradas."""
+    with open(path, encoding="utf-8", newline="") as f:
+        lines = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+    # delimitador ";" também é aceito (CSV exportado pelo Excel em pt-BR)
+    cells = (row[0].strip() for row in csv.reader(lines, delimiter=";" if any(";" in l for l in lines) else ",") if row)
+    return [c for c in cells if any(ch.isdigit() for ch in c)]
+
+_worker_template: Optional[TemplateCache] = None
+
+def _init_batch_worker(template: str):
+    """Initializer do ProcessPoolExecutor: lê e parseia o template uma vez por processo."""
+    global _worker_template
+    _worker_template = TemplateCache(template)
+
+def _batch_generate(out_path: str, mapping: dict, compat: bool):
+    if compat:
+        process_document(io.BytesIO(_worker_template.data), out_path, mapping)
+    else:
+        _worker_template.render(out_path, mapping)
+
+def run_batch(template: str, cnpjs: list, drive: Optional[str] = None, drive_text: Optional[str] = None,
+              use_ai: bool = False, ai_provider: Optional[str] = None, out_dir: Optional[str] = None,
+              extra_mapping: Optional[dict] = None, use_cache: bool = True,
+              max_workers: int = BATCH_WORKERS, compat: bool = False,
+              receitaws_rate: float = RECEITAWS_RATE) -> None:
+    """Gera um relatório por CNPJ sem perguntas interativas."""
+    if not Path(template).exists():
+        print("Template não encontrado:", template)
+        return
+    out_base = Path(out_dir or ".")
+    out_base.mkdir(parents=True, exist_ok=True)
+    ai = None
+    if use_ai:
+        try:
+            ai = get_ai_provider(ai_provider or os.environ.get("AI_PROVIDER") or "mock", use_cache=use_cache)
+        except Exception as e:
+            print("Erro ao inicializar provedor IA:", e)
+            print("Usando MockProvider como fallback.")
+            ai = MockProvider()
+    if drive and not drive.startswith(("http://", "https://")):
+        drive = "https://" + drive
+
+    def prepare(cnpj_norm: str, data: dict) -> dict:
+        mapping = build_mapping(data)
+        if drive:
+            mapping["LINK_DRIVE"] = drive
+            mapping["LINK_DRIVE_TEXT"] = drive_text or "Link Drive"
+            mapping["LINK_PARA_DOWNLOAD"] = drive
+            mapping["LINK_PARA_DOWNLOAD_TEXT"] = "Link para download"
+        for field, value in (extra_mapping or {}).items():
+            mapping[field] = value or ""
+        mapping["DOMINIOWP"] = mapping["DOMINIO"] + "/wp-admin/" if mapping.get("DOMINIO") else ""
+        mapping["ESPECIALISTARESPONSAVEL"] = "ITALO GOMES"
+        return mapping
+
+    valid, invalid = normalize_cnpj_batch(cnpjs)
+    for cnpj in invalid:
+        print(f"CNPJ inválido ({cnpj}): deve conter 14 dígitos (após remover pontuação).")
+    pace = f" (no máximo {receitaws_rate:g} por minuto)" if receitaws_rate > 0 else ""
+    print(f"Consultando ReceitaWS para {len(valid)} CNPJ(s){pace}...")
+    payloads = {}
+    for cnpj_norm, result in asyncio.run(consulta_empresas(valid, use_cache, max_workers, receitaws_rate)).items():
+        if isinstance(result, Exception):
+            print(f"[{cnpj_norm}] Falha na consulta:", result)
+        else:
+            payloads[cnpj_norm] = result
+    mappings = {}
+    for cnpj_norm, data in payloads.items():
+        try:
+            mappings[cnpj_norm] = prepare(cnpj_norm, data)
+        except Exception as e:
+            print(f"[{cnpj_norm}] Falha ao montar o relatório:", e)
+    if not mappings:
+        return
+    if ai is not None:
+        print(f"Gerando {len(mappings)} objetivo(s) com IA...")
+        items = [(ai_source_text(payloads[c], mapping), mapping) for c, mapping in mappings.items()]
+        try:
+            objectives = ai.generate_objectives(items, max_workers)
+        except Exception as e:
+            # falha do lote inteiro: cada item cai na heurística local abaixo
+            objectives = [e] * len(items)
+        for (cnpj_norm, mapping), (source_text, _), objective in zip(mappings.items(), items, objectives):
+            if isinstance(objective, Exception):
+                print(f"[{cnpj_norm}] Erro ao gerar objetivo com IA: {objective}. Usando heurística local.")
+                objective = MockProvider().generate_objective(source_text, mapping)
+            mapping["OBJETIVO_EMPRESA"] = objective
+    print(f"Gerando {len(mappings)} documento(s)...")
+    # geração do .docx é CPU (XML + zip) e presa ao GIL: um processo por núcleo
+    workers = min(os.cpu_count() or 1, len(mappings))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(template,)) as pool:
+        futures = {}
+        for cnpj_norm, mapping in mappings.items():
+            out_path = str(out_base / f"relatorio_{cnpj_norm}.docx")
+            futures[pool.submit(_batch_generate, out_path, mapping, compat)] = (cnpj_norm, out_path)
+        for fut in as_completed(futures):
+            cnpj_norm, out_path = futures[fut]
+            try:
+                fut.result()
+                print("Documento gerado:", out_path)
+            except Exception as e:
+                print(f"[{cnpj_norm}] Erro ao processar documento:", e)
+
 # ----------------- GUI flow -----------------
 if TKINTER_AVAILABLE:
     class App:
@@ -512,6 +1495,8 @@ if TKINTER_AVAILABLE:
             except Exception as e:
                 messagebox.showerror('Erro', f'CNPJ inválido: {e}')
                 return
+            # template lido/parseado em paralelo com a consulta e a IA
+            f_template = _in_background(TemplateCache, template)
             try:
                 data = consulta_empresa(cnpj_norm)
             except Exception as e:
@@ -539,12 +1524,7 @@ if TKINTER_AVAILABLE:
                 mapping['LINK_PARA_DOWNLOAD'] = drive
                 mapping['LINK_PARA_DOWNLOAD_TEXT'] = 'Link para download'
             if self.use_ai_var.get():
-                source_parts = []
-                if mapping.get('ATIVIDADE_PRINCIPAL'):
-                    source_parts.append('Atividade principal: ' + mapping['ATIVIDADE_PRINCIPAL'])
-                if mapping.get('RESUMO_EMPRESA_CLIENTE'):
-                    source_parts.append('Resumo: ' + mapping['RESUMO_EMPRESA_CLIENTE'])
-                source_text = '\n'.join(source_parts).strip() or str(data)[:2000]
+                source_text = ai_source_text(data, mapping)
                 try:
                     ai = get_ai_provider(self.ai_provider.get())
                 except Exception as e:
@@ -560,7 +1540,7 @@ if TKINTER_AVAILABLE:
                 mapping['OBJETIVO_EMPRESA'] = ''
             out = self.entry_out.get().strip() or f'relatorio_{cnpj_norm}.docx'
             try:
-                process_document(template, out, mapping)
+                f_template.result().render(out, mapping)
             except Exception as e:
                 messagebox.showerror('Erro', f'Erro ao processar documento: {e}')
                 return
@@ -572,6 +1552,12 @@ def main():
     parser = argparse.ArgumentParser(description="Preencher relatórios Word via CNPJ")
     parser.add_argument("--template", help=".docx template")
     parser.add_argument("--cnpj", help="CNPJ da empresa")
+    parser.add_argument("--cnpjs-file", "--batch", dest="cnpjs_file",
+                        help="Arquivo/CSV com um CNPJ por linha (modo lote; --out vira diretório de saída)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_WORKERS,
+                        help=f"Consultas simultâneas no modo lote (padrão {BATCH_WORKERS})")
+    parser.add_argument("--receitaws-rate", type=float, default=RECEITAWS_RATE,
+                        help=f"Consultas por minuto à ReceitaWS no modo lote (padrão {RECEITAWS_RATE:g}; 0 = sem limite)")
     parser.add_argument("--drive", help="Link do Drive")
     parser.add_argument("--drive-text", help="Texto do link do Drive")
     parser.add_argument("--use-ai", action="store_true", help="Usar IA para preencher [OBJETIVO_EMPRESA]")
@@ -583,13 +1569,20 @@ def main():
     parser.add_argument("--dominio", help="Texto [DOMINIO]")
     parser.add_argument("--demanda", help="Texto [DEMANDA]")
     parser.add_argument("--identidade-visual", help="Caminho da imagem [IDENTIDADE_VISUAL_E_PALETA_DE_CORES]")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorar o cache local (consultas à ReceitaWS e objetivos gerados pela IA)")
+    parser.add_argument("--compat", action="store_true", help="Gerar o .docx pelo python-docx em vez do caminho rápido (lxml)")
     parser.add_argument("--run-tests", action="store_true", help="Executar testes rápidos")
     args = parser.parse_args()
     if args.run_tests:
         print("Testes simples:")
+        from docx import Document
         try:
             assert normalize_cnpj("12.345.678/0001-95") == "12345678000195"
             assert normalize_cnpj("12345678000195") == "12345678000195"
+            assert normalize_cnpj("12.345.678/0001–95") == "12345678000195"
+            assert normalize_cnpj(" 12 345 678\t0001-95¹\n") == "12345678000195"
+            assert normalize_cnpj_batch(["12.345.678/0001-95", "12345678000195", "123"]) == (["12345678000195"], ["123"])
+            assert normalize_cnpj_batch(["12.345.678/0001–95", "1\n2"]) == (["12345678000195"], ["1\n2"])
             print("normalize_cnpj OK")
         except AssertionError:
             print("normalize_cnpj falhou")
@@ -602,8 +1595,82 @@ def main():
             print("replace_in_paragraph OK")
         except Exception as e:
             print("replace_in_paragraph falhou:", e)
+        try:
+            import tempfile
+            with tempfile.TemporaryDirectory() as tmp:
+                doc = Document()
+                p = doc.add_paragraph("Empresa: ")
+                p.add_run("[NOME_EMPRESA").bold = True
+                p.add_run("_CLIENTE] - [CNPJ]")
+                doc.add_paragraph("Drive: [LINK_DRIVE]")
+                doc.add_paragraph("Pasta:\t[LINK_DRIVE]")
+                doc.sections[0].header.paragraphs[0].text = "CNPJ [CNPJ]"
+                src, dst = os.path.join(tmp, "t.docx"), os.path.join(tmp, "o.docx")
+                doc.save(src)
+                mapping = {"NOME_EMPRESA_CLIENTE": "ACME", "CNPJ": "123", "LINK_DRIVE": "https://x"}
+                fast_process_document(src, dst, mapping)
+                out = Document(dst)
+                assert out.paragraphs[0].text == "Empresa: ACME - 123"
+                assert out.paragraphs[0].runs[1].bold and out.paragraphs[0].runs[1].text == "ACME"
+                assert len(out.element.body.findall(".//" + (_W + "hyperlink"))) == 2
+                assert out.paragraphs[2].runs[0].text == "Pasta:\t"
+                assert out.sections[0].header.paragraphs[0].text == "CNPJ 123"
+            print("fast_process_document OK")
+        except Exception as e:
+            print("fast_process_document falhou:", e)
+        try:
+            class _CountingProvider(AIProviderBase):
+                calls = 0
+                def generate_objective(self, source_text, context):
+                    self.calls += 1
+                    return "objetivo " + source_text
+            counting = _CountingProvider()
+            cached = CachedAIProvider(counting)
+            memory = {}
+            cached._get, cached._set = memory.get, memory.__setitem__  # sem tocar no cache em disco
+            out = cached.generate_objectives([("a", {})] * 10 + [("b", {})])
+            assert out == ["objetivo a"] * 10 + ["objetivo b"] and counting.calls == 2
+            cached.generate_objectives([("a", {}), ("b", {})])
+            assert counting.calls == 2
+            print("CachedAIProvider OK")
+        except Exception as e:
+            print("CachedAIProvider falhou:", e)
+        try:
+            import http.server
+            import requests
+
+            class _TooManyRequests(http.server.BaseHTTPRequestHandler):
+                def do_POST(self):
+                    self.send_response(429)
+                    self.send_header("Retry-After", "60")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+
+                def log_message(self, *args):
+                    pass
+            server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _TooManyRequests)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_port}/"
+            session = requests.Session()
+            session.mount(url, _make_adapter(**HF_RETRY_OPTIONS))
+            try:
+                resp = session.post(url, json={}, timeout=5)
+            finally:
+                server.shutdown()
+            # o 429 chega à resposta (sem RetryError nem espera no urllib3) e a pausa acima do teto falha
+            assert resp.status_code == 429
+            limiter = _RateLimiter(1, HF_MAX_PAUSE)
+            limiter.update(resp.headers)
+            try:
+                with limiter:
+                    raise AssertionError("pausa acima de HF_MAX_PAUSE não falhou")
+            except RuntimeError:
+                pass
+            print("_RateLimiter OK")
+        except Exception as e:
+            print("_RateLimiter falhou:", e)
         return
-    if TKINTER_AVAILABLE and not any([args.template, args.cnpj, args.drive]):
+    if TKINTER_AVAILABLE and not any([args.template, args.cnpj, args.drive, args.cnpjs_file]):
         root = tk.Tk()
         app = App(root)
         root.mainloop()
@@ -616,6 +1683,24 @@ def main():
             "DEMANDA": args.demanda or "",
             "IDENTIDADE_VISUAL_E_PALETA_DE_CORES": args.identidade_visual or "",
         }
+        if args.cnpjs_file:
+            if not args.template:
+                parser.error("--cnpjs-file requer --template")
+            run_batch(
+                template=args.template,
+                cnpjs=read_cnpjs_file(args.cnpjs_file),
+                drive=args.drive,
+                drive_text=args.drive_text,
+                use_ai=args.use_ai,
+                ai_provider=args.ai_provider,
+                out_dir=args.out,
+                extra_mapping=extra_mapping,
+                use_cache=not args.no_cache,
+                max_workers=max(1, args.concurrency),
+                compat=args.compat,
+                receitaws_rate=max(0.0, args.receitaws_rate),
+            )
+            return
         run_cli(
             template=args.template,
             cnpj=args.cnpj,
@@ -624,8 +1709,11 @@ def main():
             use_ai=args.use_ai,
             ai_provider=args.ai_provider,
             out=args.out,
-            extra_mapping=extra_mapping
+            extra_mapping=extra_mapping,
+            use_cache=not args.no_cache,
+            compat=args.compat,
         )
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # ProcessPoolExecutor no executável do PyInstaller (Windows)
     main()
\ No newline at end of file